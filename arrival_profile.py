@@ -0,0 +1,148 @@
+"""
+Time-varying train arrival rates. A profile file lists the rate (trains per hour) from each start time onward:
+    # comments and blank lines are ignored
+    period 168      (optional) the profile repeats every 168 hours
+    linear          (optional) interpolate between points instead of holding each rate until the next point
+    0    0.05
+    6    0.20
+    18   0.08
+Without 'period', the last rate holds forever. Arrivals are generated by thinning (Lewis & Shedler): candidates come
+from a piecewise-constant envelope over the profile and each one is kept with probability rate / envelope.
+"""
+from bisect import bisect_right
+from math import ceil, inf, log
+
+MAX_ENVELOPE_SLACK = 0.1  # linear segments are split until the envelope is within 10% of the rate under it
+MAX_PIECES_PER_SEGMENT = 64
+
+
+class RateProfile:
+    """Piecewise arrival rate over time, optionally repeating every 'period' hours"""
+
+    def __init__(self, starts, rates, period=None, linear=False):
+        if not starts or starts[0] != 0:
+            raise ValueError("the profile must start at time 0")
+        if len(starts) != len(rates):
+            raise ValueError("every start time needs a rate")
+        if any(later <= earlier for earlier, later in zip(starts, starts[1:])):
+            raise ValueError("start times must be strictly increasing")
+        if any(rate < 0 for rate in rates) or not any(rate > 0 for rate in rates):
+            raise ValueError("rates can't be negative and at least one must be positive")
+        if period is not None and period <= starts[-1]:
+            raise ValueError("the period must be longer than the last start time")
+
+        self.starts = list(starts)
+        self.rates = list(rates)
+        self.period = period
+        self.linear = linear
+        self._build_envelope()
+
+    def _build_envelope(self):
+        '''precomputes the pieces of the envelope: start, end, envelope rate, rate at start, and slope of the rate'''
+        self.piece_starts = []
+        self.piece_ends = []
+        self.envelopes = []
+        self.base_rates = []
+        self.slopes = []
+
+        for i, start in enumerate(self.starts):
+            if i + 1 < len(self.starts):
+                end, end_rate = self.starts[i + 1], self.rates[i + 1]
+            elif self.period is not None:
+                end, end_rate = self.period, self.rates[0]  # wraps around to the start of the next period
+            else:
+                end, end_rate = inf, self.rates[i]  # the last rate holds forever
+
+            rate = self.rates[i]
+            if not self.linear or end == inf:
+                end_rate = rate
+            slope = (end_rate - rate) / (end - start) if end_rate != rate else 0
+
+            # split the segment until rate and envelope are close, so few candidates get rejected
+            top = max(rate, end_rate)
+            pieces = 1
+            if slope != 0:
+                pieces = min(MAX_PIECES_PER_SEGMENT, ceil(abs(end_rate - rate) / (MAX_ENVELOPE_SLACK * top)))
+            bounds = [start + (end - start) * k / pieces for k in range(1, pieces)]  # empty for unbounded segments
+            for piece_start, piece_end in zip([start] + bounds, bounds + [end]):
+                piece_rate = rate + slope * (piece_start - start)
+                piece_end_rate = rate + slope * (piece_end - start) if slope != 0 else rate
+                self.piece_starts.append(piece_start)
+                self.piece_ends.append(piece_end)
+                self.envelopes.append(max(piece_rate, piece_end_rate))
+                self.base_rates.append(piece_rate)
+                self.slopes.append(slope)
+
+    def rate(self, time):
+        '''returns the arrival rate at 'time' '''
+        if self.period is not None:
+            time %= self.period
+        i = bisect_right(self.piece_starts, time) - 1
+        return self.base_rates[i] + self.slopes[i] * (time - self.piece_starts[i])
+
+    def arrival_times(self, stream):
+        '''generates arrival times from time 0 onward using random stream 'stream'; stops only if the rate drops
+        to 0 for good'''
+        num_pieces = len(self.piece_starts)
+        i = 0
+        offset = 0  # start time of the current period
+        now = 0
+
+        while True:
+            envelope = self.envelopes[i]
+            end = offset + self.piece_ends[i]
+            if envelope > 0:
+                now -= log(1.0 - stream.random()) / envelope  # candidate from the envelope's poisson process
+            else:
+                now = inf
+
+            if now >= end:
+                # no candidate in this piece; the exponential is memoryless, so restart from the next piece
+                if end == inf:
+                    return
+                now = end
+                i += 1
+                if i == num_pieces:
+                    i = 0
+                    offset += self.period
+                continue
+
+            slope = self.slopes[i]
+            if slope != 0:
+                rate = self.base_rates[i] + slope * (now - offset - self.piece_starts[i])
+                if stream.random() * envelope > rate:
+                    continue  # thinned out
+            yield now
+
+
+def load_profile(file):
+    '''reads a rate profile from an open file; raises ValueError on malformed lines'''
+    starts = []
+    rates = []
+    period = None
+    linear = False
+
+    for line_num, line in enumerate(file, 1):
+        fields = line.split("#")[0].split()
+        try:
+            if not fields:
+                continue
+            elif fields[0] == "period" and len(fields) == 2:
+                period = float(fields[1])
+            elif fields == ["linear"]:
+                linear = True
+            elif len(fields) == 2:
+                starts.append(float(fields[0]))
+                rates.append(float(fields[1]))
+            else:
+                raise ValueError("expected 'START RATE', 'period HOURS' or 'linear'")
+        except ValueError as e:
+            raise ValueError(f"line {line_num} of rate profile: {e}") from None
+
+    return RateProfile(starts, rates, period, linear)
+
+
+def read_profile(path):
+    '''loads the rate profile stored at 'path' '''
+    with open(path, 'r') as file:
+        return load_profile(file)
@@ -1,11 +1,18 @@
 import heapq as hq
 from collections import defaultdict
-from random import uniform, seed
+from random import seed
+from distributions import ServiceTimes
 #seed(100)
 
+default_service = ServiceTimes()  # used by trains created without their own ServiceTimes
+
 class eventQueue:
-    def __init__(self):
-        self.container = []
+    def __init__(self, events=None, is_sorted=False):
+        '''events: optional list to build the queue from in one go; the list is used as-is, not copied
+        is_sorted: set if events are already in order of arrival, which makes them a valid heap as they are'''
+        self.container = [] if events is None else events
+        if not is_sorted:
+            hq.heapify(self.container)  # O(n), compared to O(n log n) for pushing one at a time
 
     def push(self, element):
         '''adds an event to the back of the queue'''
@@ -56,11 +63,12 @@ class trainQueue:
 
 
 class train:
-    def __init__(self, time, id):
+    def __init__(self, time, id, service=None):
         self.arrival = time  # when the train arrived
         self.train_id = id  # for the event log
-        self.remaining_crew_time = round(uniform(6, 11), 2)  # how much time left the current crew has
-        self.unload_time = round(uniform(3.5, 4.5), 2)  # how long this train will take to unload
+        self.service = service or default_service  # draws crew hours, unload times, travel times and shifts
+        self.remaining_crew_time = round(self.service.crew(), 2)  # how much time left the current crew has
+        self.unload_time = round(self.service.unload(), 2)  # how long this train will take to unload
         self.remaining_unload_time = self.unload_time  # how long the train has left before it's finished unloading
         self.num_crews = 1  # how many crews this train has had
         self.is_hogged_out = False
@@ -123,9 +131,10 @@ class train:
                         except IndexError:
                             self.crew_time_to_arrive = self._replacement_crew_arrival_time()
 
+                    shift = self.service.shift()  # how long the new crew can work
                     if self.crew_time_to_arrive > passed_time:
                         # the new crew will not arrive by the current time
-                        self.remaining_crew_time = 12 - passed_time  # update remaining crew time to current time
+                        self.remaining_crew_time = shift - passed_time  # update remaining crew time to current time
                         self.crew_time_to_arrive -= passed_time
                         self._now = current_time  # "now" is caught up with current time
                         passed_time = 0
@@ -133,7 +142,7 @@ class train:
 
                     else:
                         # the new crew will arrive by the current time
-                        self.remaining_crew_time = 12 - self.crew_time_to_arrive  # update remaining crew time
+                        self.remaining_crew_time = shift - self.crew_time_to_arrive  # update remaining crew time
                         self._now += self.crew_time_to_arrive  # "now" is the moment the new crew arrived
                         #print(f"Time {round(self._now, 2)}: train {self.train_id} replacement crew",
                         #      f"{self.num_crews-1} arrives (SERVER UNHOGGED)")
@@ -192,7 +201,7 @@ class train:
 
     def _replacement_crew_arrival_time(self):
         '''randomly determines the new crew's arrival time'''
-        return round(uniform(2.5, 3.5), 2)
+        return round(self.service.travel(), 2)
 
     def _clean_floats(self):
         '''Rounds floats to nearest 100th'''
@@ -235,6 +244,9 @@ class statTracker:
         print("Statistics")
         print("----------")
         print(f"Total number of trains served: {self.num_trains}")
+        if not self.time_in_system:
+            print("No trains arrived, so there are no other statistics")  # e.g. a rate profile that stays near 0
+            return
         print(f"Average time-in-system per train: {round(sum(self.time_in_system) / len(self.time_in_system), 4)}h")
         print(f"Maximum time-in-system per train: {round(max(self.time_in_system), 4)}h")
         print(f"Dock idle percentage: {round(self.status_times[0] / self._now, 4) * 100}%")
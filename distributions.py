@@ -0,0 +1,196 @@
+"""
+Distributions for the sim's random quantities, so they can be swapped for ones fitted from yard data. A distribution is
+given as a spec string, NAME:PARAMS:
+    uniform:LOW,HIGH
+    exponential:MEAN
+    lognormal:MU,SIGMA      (mu and sigma of the underlying normal distribution)
+    constant:VALUE
+    empirical:FILE          (one observed value per line, optionally followed by its weight)
+Samples are drawn a block at a time, so a draw in the sim is just the next item of a pre-generated list.
+"""
+from itertools import repeat
+from random import Random
+
+BLOCK_SIZE = 1024
+
+# the random quantities of the sim and the distributions they had before they were configurable
+QUANTITIES = {
+    "unload": "uniform:3.5,4.5",  # how long a train takes to unload
+    "crew": "uniform:6,11",  # hours left for the crew a train arrives with
+    "travel": "uniform:2.5,3.5",  # how long a replacement crew takes to arrive
+    "shift": "constant:12",  # hours a replacement crew can work
+}
+
+
+class Uniform:
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample_block(self, stream, size):
+        uniform, low, high = stream.uniform, self.low, self.high
+        return [uniform(low, high) for _ in repeat(None, size)]
+
+
+class Exponential:
+    def __init__(self, mean):
+        if mean <= 0:
+            raise ValueError("the mean of an exponential distribution must be positive")
+        self.mean = mean
+
+    def sample_block(self, stream, size):
+        expovariate, rate = stream.expovariate, 1 / self.mean
+        return [expovariate(rate) for _ in repeat(None, size)]
+
+
+class Lognormal:
+    def __init__(self, mu, sigma):
+        self.mu = mu
+        self.sigma = sigma
+
+    def sample_block(self, stream, size):
+        lognormvariate, mu, sigma = stream.lognormvariate, self.mu, self.sigma
+        return [lognormvariate(mu, sigma) for _ in repeat(None, size)]
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def sample_block(self, stream, size):
+        return [self.value] * size
+
+
+class Empirical:
+    """Draws from a set of observed values using an alias table, so each draw takes one random number no matter how
+    many values there are"""
+
+    def __init__(self, values, weights=None):
+        if not values:
+            raise ValueError("an empirical distribution needs at least one value")
+        if weights is None:
+            weights = [1] * len(values)
+        if len(weights) != len(values) or any(weight < 0 for weight in weights) or sum(weights) <= 0:
+            raise ValueError("weights must be non-negative, not all 0, and one per value")
+
+        self.values = list(values)
+        self.probabilities, self.aliases = self._build_alias_table(weights)
+
+    def _build_alias_table(self, weights):
+        '''Vose's alias method: splits the weights into equal columns, each holding a value and possibly an alias'''
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        probabilities = [1.0] * n
+        aliases = list(self.values)
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = self.values[more]  # the rest of the column is filled by 'more'
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+        return probabilities, aliases  # anything left over is a full column (probability 1) due to rounding
+
+    def sample_block(self, stream, size):
+        rand, n = stream.random, len(self.values)
+        values, probabilities, aliases = self.values, self.probabilities, self.aliases
+        block = []
+        for _ in repeat(None, size):
+            u = rand() * n
+            i = int(u)
+            block.append(values[i] if u - i < probabilities[i] else aliases[i])  # one number picks column and side
+        return block
+
+    @classmethod
+    def from_file(cls, path):
+        '''reads observed values (and optional weights) from a file, one per line'''
+        values = []
+        weights = []
+        with open(path, 'r') as file:
+            for line in file:
+                fields = line.split()
+                if not fields:
+                    continue
+                values.append(float(fields[0]))
+                weights.append(float(fields[1]) if len(fields) > 1 else 1.0)
+        return cls(values, weights)
+
+
+DISTRIBUTIONS = {
+    "uniform": lambda params: Uniform(*_numbers(params, 2)),
+    "exponential": lambda params: Exponential(*_numbers(params, 1)),
+    "lognormal": lambda params: Lognormal(*_numbers(params, 2)),
+    "constant": lambda params: Constant(*_numbers(params, 1)),
+    "empirical": Empirical.from_file,
+}
+
+
+def _numbers(params, count):
+    '''parses the comma separated numeric parameters of a spec'''
+    numbers = [float(param) for param in params.split(",")]
+    if len(numbers) != count:
+        raise ValueError(f"expected {count} parameter(s), got {len(numbers)}")
+    return numbers
+
+
+def register(name, factory):
+    '''adds a distribution; 'factory' takes the text after the colon of a spec and returns an object with
+    sample_block(stream, size)'''
+    DISTRIBUTIONS[name] = factory
+
+
+def parse_spec(spec):
+    '''turns a spec string such as "uniform:3.5,4.5" into a distribution; raises ValueError if it's invalid'''
+    name, _, params = spec.partition(":")
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution '{name}', expected one of {', '.join(DISTRIBUTIONS)}")
+    try:
+        return DISTRIBUTIONS[name](params)
+    except ValueError as e:
+        raise ValueError(f"bad distribution '{spec}': {e}") from None
+
+
+class Sampler:
+    """Draws from a distribution in pre-generated blocks that are refilled once used up"""
+
+    def __init__(self, distribution, stream, block_size=BLOCK_SIZE):
+        self.distribution = distribution
+        self.stream = stream
+        self.block_size = block_size
+        self.draw = self._draws().__next__  # a generator resume per draw, with no per-draw distribution logic
+
+    def _draws(self):
+        while True:
+            yield from self.distribution.sample_block(self.stream, self.block_size)
+
+
+class ServiceTimes:
+    """One sampler for each random quantity in the sim, e.g. service_times.unload() draws an unload time"""
+
+    def __init__(self, specs=None, seed=None, streams=None):
+        '''specs: quantity -> spec string, for quantities that don't use their default distribution
+        streams: quantity -> random stream to draw from; other quantities get streams derived from 'seed' '''
+        specs = dict(specs or {})
+        streams = streams or {}
+        unknown = set(specs) - set(QUANTITIES)
+        if unknown:
+            raise ValueError(f"unknown quantity '{unknown.pop()}', expected one of {', '.join(QUANTITIES)}")
+
+        parent_stream = Random(seed)
+        for quantity, default in QUANTITIES.items():
+            distribution = parse_spec(specs.get(quantity, default))
+            stream = streams.get(quantity) or Random(parent_stream.getrandbits(64))
+            setattr(self, quantity, Sampler(distribution, stream).draw)
+
+
+def parse_assignment(text):
+    '''splits a command line "QUANTITY=SPEC" into its parts, checking both'''
+    quantity, _, spec = text.partition("=")
+    if quantity not in QUANTITIES:
+        raise ValueError(f"unknown quantity '{quantity}', expected one of {', '.join(QUANTITIES)}")
+    parse_spec(spec)
+    return quantity, spec
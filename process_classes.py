@@ -1,13 +1,23 @@
 import simpy as sp
+import heapq as hq
 from random import Random
 from itertools import count
 from collections import defaultdict
+from math import inf
+
+
+def reset_counters():
+    """restarts train and crew ids at 0; needed when more than one sim runs in the same process"""
+    Train.num_trains = count(0)
+    Crew.num_crews = count(0)
+
 
 class Train:
     num_trains = count(0)
 
-    def __init__(self, env, unload_time, dock, crew_time, stats, rand_stream, trav_times=None):
+    def __init__(self, env, unload_time, dock, crew_time, stats, service, crews, trav_times=None):
         self.env = env
+        self.crews = crews  # CrewScheduler that hogs out this train's crews
         self.arrival = env.now  # used for time-in-system stat
         self.tracker = stats  # stat tracker
         self.id = next(self.num_trains)
@@ -16,16 +26,16 @@ class Train:
         self.crew = Crew(self.env, crew_time, self)  # create the corresponding crew process
         self.action = env.process(self.run(dock))  # the train process; used by crew to interrupt upon hogout
         self.num_hogouts = 0  # used for stats
-        self.rand_stream = rand_stream  # random stream for crew arrival times
+        self.service = service  # ServiceTimes that draws crew arrival times and shift lengths
         self.travel_times = trav_times  # gives train access to pregenerated file of crew arrival times
-        self.departed = env.event()  # used in conditional event to kill crew processes when train terminates
+        self.departed = env.event()  # used by the arrival process to wait for the last train
 
 
     def run(self, dock):
         '''The train process. Consists of two parts: 1) waiting in queue, 2) waiting to unload'''
         print(f"Time {self.env.now:.2f}: train {self.id} arrival for {self.unload_time:.2f}h of unloading,",
               f"crew {self.crew.id} with {self.crew.remaining_time:.2f}h before hogout (Q={len(dock.queue)})")
-        self.env.process(self.crew.run())  # run the previously created crew process
+        self.crews.start(self.crew)  # start the previously created crew's clock
         req = dock.request()  # creates a request for the dock; adds train to queue
 
         while True:
@@ -43,15 +53,15 @@ class Train:
                 # hogout in queue
                 self.num_hogouts += 1
                 print(f"Time {self.env.now:.2f}: train {self.id} crew {self.crew.id} hogged out in queue (SERVER HOGGED)")
-                self.crew = self.new_crew()  # create new crew process
-                self.env.process(self.crew.run())  # run new crew process
+                self.crew = self.new_crew()  # create new crew
+                self.crews.start(self.crew)  # start new crew's clock
 
                 if self.travel_times is not None:
                     # pre-generated travel time
                     yield self.env.timeout(float(self.travel_times.readline().strip()))
                 else:
                     # random travel time
-                    yield self.env.timeout(self.rand_stream.uniform(2.5, 3.5))  # wait for new crew to arrive
+                    yield self.env.timeout(self.service.travel())  # wait for new crew to arrive
 
                 print(f"Time {self.env.now:.2f}: train {self.id} replacement crew {self.crew.id} arrives (SERVER UNHOGGED)")
                 continue
@@ -63,7 +73,7 @@ class Train:
                 print(f"Time {self.env.now:.2f}: train {self.id} departing (Q={len(dock.queue)})")
                 self.tracker.update_dock(0)  # tell stat tracker that dock is now idle
                 self.tracker.scrape_train_info(self)  # gathers relevant train stats before process terminates
-                self.departed.succeed()  # ends corresponding crew process; ends simulation if last train
+                self.departed.succeed()  # current crew won't hog out anymore; ends simulation if last train
                 dock.release(req)
                 break
             except sp.Interrupt:
@@ -72,15 +82,15 @@ class Train:
                 self.unload_time -= self.env.now - self.time_entered_dock  # update unload time for partial unload
                 print(f"Time {self.env.now:.2f}: train {self.id} crew {self.crew.id} hogged out during service (SERVER HOGGED)")
                 self.tracker.update_dock(-1)  # tell stat tracker that dock is now hogged out
-                self.crew = self.new_crew()  # create new crew process
-                self.env.process(self.crew.run())  # run new crew process
+                self.crew = self.new_crew()  # create new crew
+                self.crews.start(self.crew)  # start new crew's clock
 
                 if self.travel_times is not None:
                     # pre-generated travel time
                     yield self.env.timeout(float(self.travel_times.readline().strip()))
                 else:
                     # random travel time
-                    yield self.env.timeout(self.rand_stream.uniform(2.5, 3.5))  # wait for new crew to arrive
+                    yield self.env.timeout(self.service.travel())  # wait for new crew to arrive
 
                 self.tracker.update_dock(1)  # tell stat tracker that dock is busy again
                 print(f"Time {self.env.now:.2f}: train {self.id} replacement crew {self.crew.id} arrives (SERVER UNHOGGED)")
@@ -89,7 +99,7 @@ class Train:
 
     def new_crew(self):
         '''creates replacement crew'''
-        return Crew(self.env, 12, self)
+        return Crew(self.env, self.service.shift(), self)
 
     def crew_remaining_time(self):
         '''this is needed because the crew's remaining time doesn't count down, it just waits until it expires'''
@@ -107,11 +117,54 @@ class Crew:
         self.train = train
 
 
-    def run(self):
-        '''crew process; waits until hogout and interrupts train process'''
-        yield self.env.timeout(self.remaining_time) | self.train.departed
-        if not self.train.departed.processed:  # crew process ends if train departs
-            self.train.action.interrupt()
+    def is_working(self):
+        '''a crew stops mattering once it's been replaced or its train has departed'''
+        return self.train.crew is self and not self.train.departed.triggered
+
+
+class CrewScheduler:
+    """Hogs out crews when their time runs out. Rather than a process (and a timeout/departure condition) per crew,
+    every crew's deadline goes in one heap and a single timeout waits for the earliest of them."""
+
+    def __init__(self, env):
+        self.env = env
+        self.deadlines = []  # heap of (deadline, start order, crew); ties go in the order the crews started
+        self.started = count(0)
+        self.timer = None  # timeout for the earliest deadline; an earlier deadline replaces it
+        self.timer_deadline = inf
+
+    def start(self, crew):
+        '''starts the clock of a crew that just began working'''
+        deadline = self.env.now + crew.remaining_time
+        hq.heappush(self.deadlines, (deadline, next(self.started), crew))
+        if deadline < self.timer_deadline:
+            self._set_timer(deadline)
+
+    def _set_timer(self, deadline):
+        self.timer_deadline = deadline
+        self.timer = self.env.timeout(deadline - self.env.now)
+        self.timer.callbacks.append(self._expire)
+
+    def _expire(self, timer):
+        '''timeout callback; the hogouts themselves wait for one more event, like the crew processes used to, so
+        anything else already due at this time (e.g. a departure) happens first'''
+        if timer is not self.timer:
+            return  # replaced by a timer for an earlier deadline
+        hogouts = self.env.event()
+        hogouts.callbacks.append(self._hog_out)
+        hogouts.succeed()
+
+    def _hog_out(self, event):
+        '''hogs out every crew whose time is up and waits for the next deadline'''
+        while self.deadlines and self.deadlines[0][0] <= self.timer_deadline:
+            crew = hq.heappop(self.deadlines)[2]
+            if crew.is_working():  # crews of departed trains are dropped here instead of being cancelled
+                crew.train.action.interrupt()
+
+        self.timer = None
+        self.timer_deadline = inf
+        if self.deadlines:
+            self._set_timer(self.deadlines[0][0])
 
 
 class StatTracker:
@@ -133,6 +186,9 @@ class StatTracker:
         """Prints out the post-simulation statistics"""
         print("\nStatistics")
         print(f"Total number of trains served: {next(Train.num_trains)}")
+        if not self.time_in_system:
+            print("No trains arrived, so there are no other statistics")  # e.g. a rate profile that stays near 0
+            return
         print(f"Average time-in-system per train: {sum(self.time_in_system) / len(self.time_in_system):.2f}h")
         print(f"Maximum time-in-system per train: {max(self.time_in_system):.2f}h")
         print(f"Dock idle percentage: {((self.status_times[0] + self.status_times[-1]) / self.env.now) * 100:.2f}%")
@@ -0,0 +1,95 @@
+"""
+Single entry point for both versions of the sim:
+    python sim.py [--engine process|event] [--seed N] ARRIVAL_RATE SIM_TIME
+    python sim.py [--engine process|event] [--seed N] --profile RATE_PROFILE SIM_TIME
+    python sim.py [--engine process|event] -s SCHEDULE TRAVEL_TIMES
+Any random quantity can be given a different distribution with --dist, e.g. --dist unload=lognormal:1.38,0.08 (see
+distributions.py); with -s, only the quantities not read from its files can. The engine modules (and simpy) are only
+imported once the arguments are known to be valid.
+"""
+import argparse
+import math
+import sys
+from distributions import parse_assignment
+
+ENGINES = {
+    "process": "train2",  # simpy, process-based version
+    "event": "train",  # hand-written, event-based version
+}
+
+# quantities that -s reads from its files, so they can't be given a distribution; the event engine only draws travel
+# times once its travel time file runs out
+SCHEDULED_QUANTITIES = {
+    "process": ("unload", "crew", "travel"),
+    "event": ("unload", "crew"),
+}
+
+
+def build_parser(engine=None):
+    parser = argparse.ArgumentParser(description="Simulate a train unloading dock.")
+    if engine is None:
+        parser.add_argument("--engine", choices=ENGINES, default="process",
+                            help="which version of the sim to run (default: process)")
+    parser.add_argument("--seed", type=int, help="seed for the random streams, to make a run repeatable")
+    parser.add_argument("-s", "--schedule", nargs=2, metavar=("SCHEDULE", "TRAVEL_TIMES"),
+                        help="read train arrivals and crew travel times from files instead of generating them")
+    parser.add_argument("--profile", metavar="RATE_PROFILE",
+                        help="generate arrivals from a time-varying rate profile (see arrival_profile.py) "
+                             "instead of ARRIVAL_RATE")
+    parser.add_argument("--dist", action="append", default=[], metavar="QUANTITY=SPEC",
+                        help="distribution for unload, crew, travel or shift, e.g. travel=empirical:travel.txt")
+    parser.add_argument("arrival_rate", type=float, nargs="?", help="average time between train arrivals (hours)")
+    parser.add_argument("sim_time", type=int, nargs="?", help="time after which no more trains arrive (hours)")
+    return parser
+
+
+def parse_args(argv, engine=None):
+    '''parses and validates command line arguments; exits with a usage message if they're invalid'''
+    parser = build_parser(engine)
+    args = parser.parse_args(argv)
+    if engine is not None:
+        args.engine = engine
+
+    try:
+        args.distributions = dict(parse_assignment(assignment) for assignment in args.dist)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+
+    if args.schedule is not None:
+        for quantity in SCHEDULED_QUANTITIES[args.engine]:
+            if quantity in args.distributions:
+                parser.error(f"--dist {quantity}= can't be used with -s, which reads {quantity} times from its files")
+
+    if args.profile is not None:
+        # with a profile the only positional argument is the sim time, which argparse put in the first slot
+        if args.schedule is not None:
+            parser.error("--profile can't be used with -s")
+        if args.arrival_rate is None or args.sim_time is not None or not args.arrival_rate.is_integer():
+            parser.error("--profile takes a single integer SIM_TIME instead of ARRIVAL_RATE and SIM_TIME")
+        args.arrival_rate, args.sim_time = None, int(args.arrival_rate)  # the profile replaces the arrival rate
+        return args
+
+    if args.schedule is None and (args.arrival_rate is None or args.sim_time is None):
+        parser.error("either ARRIVAL_RATE and SIM_TIME or -s SCHEDULE TRAVEL_TIMES is required")
+    if args.schedule is not None and args.arrival_rate is not None:
+        parser.error("ARRIVAL_RATE and SIM_TIME can't be used with -s")
+    if args.arrival_rate is not None and not (math.isfinite(args.arrival_rate) and args.arrival_rate > 0):
+        parser.error("ARRIVAL_RATE must be a positive number")
+    return args
+
+
+def main(argv=None, engine=None):
+    '''runs the sim described by 'argv'; 'engine' fixes the engine for the per-version scripts'''
+    args = parse_args(sys.argv[1:] if argv is None else argv, engine)
+    module = __import__(ENGINES[args.engine])  # deferred so that only the chosen engine gets loaded
+
+    if args.schedule is not None:
+        schedule, travel_times = args.schedule
+        return module.run_simulation(seed=args.seed, schedule=schedule, travel_times=travel_times,
+                                     distributions=args.distributions)
+    return module.run_simulation(args.arrival_rate, args.sim_time, seed=args.seed, profile=args.profile,
+                                 distributions=args.distributions)
+
+
+if __name__ == "__main__":
+    main()
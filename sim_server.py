@@ -0,0 +1,264 @@
+"""
+Long-lived job server for the simpy sim (train2.py). Scenarios are requested over HTTP, either on a TCP port or a
+Unix socket, e.g.:
+    GET /run?rate=10&time=10000&seed=4
+    GET /run?profile=weekday.txt&time=10000&seed=4
+    GET /run?schedule=schedule.txt&travel=traveltimes.txt
+    GET /run?rate=10&time=10000&seed=4&unload_dist=lognormal:1.38,0.08
+Any quantity in distributions.QUANTITIES can be given a distribution spec with a QUANTITY_dist parameter, except those
+that a schedule run reads from its files.
+The response body is exactly what train2.py would have printed for the same scenario. Files (schedules, travel times,
+profiles and empirical distributions) are named relative to the server's data directory and can't be outside it.
+"""
+import asyncio
+import argparse
+import io
+import math
+import os
+import sys
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from urllib.parse import urlsplit, parse_qs
+from distributions import QUANTITIES, parse_spec
+from sim import SCHEDULED_QUANTITIES
+
+
+def _warm_up():
+    '''runs once in each worker process so that simpy is already imported when the first job arrives'''
+    import simpy  # train2 only imports simpy and process_classes once a sim runs
+    import process_classes
+    import train2
+
+
+def _started():
+    '''no-op job; submitting one per worker makes the pool start (and warm up) all of its workers'''
+    return os.getpid()
+
+
+def run_scenario(arrival_rate, sim_time, seed, schedule, travel_times, profile, distributions):
+    '''runs one simulation inside a worker process; returns everything the sim printed'''
+    import train2
+    output = io.StringIO()
+    with redirect_stdout(output):
+        train2.run_simulation(arrival_rate, sim_time, seed, schedule, travel_times, profile, distributions)
+    return output.getvalue()
+
+
+def _data_path(data_dir, name):
+    '''resolves a file named in a request against the data directory; raises ValueError if it's outside it'''
+    path = os.path.realpath(os.path.join(data_dir, name))
+    if os.path.commonpath([path, data_dir]) != data_dir:
+        raise ValueError(f"'{name}' is not in the data directory")
+    return path
+
+
+def _file_stamp(path):
+    '''identifies a particular version of an input file, so an edited schedule isn't served from the cache'''
+    if path is None:
+        return None
+    info = os.stat(path)
+    return os.path.abspath(path), info.st_mtime_ns, info.st_size
+
+
+def _spec_stamp(spec):
+    '''identifies a distribution spec, including the version of the file behind an empirical distribution'''
+    name, _, params = spec.partition(":")
+    return (name, _file_stamp(params)) if name == "empirical" else spec
+
+
+class Scenario:
+    """The parameters of a single simulation request"""
+
+    def __init__(self, arrival_rate=10, sim_time=10000, seed=None, schedule=None, travel_times=None, profile=None,
+                 distributions=None):
+        self.arrival_rate = arrival_rate
+        self.sim_time = sim_time
+        self.seed = seed
+        self.schedule = schedule
+        self.travel_times = travel_times
+        self.profile = profile
+        self.distributions = distributions or {}  # quantity -> distribution spec
+
+    @classmethod
+    def from_query(cls, query, data_dir="."):
+        '''builds a scenario from a url query string, with file names resolved against 'data_dir'; raises
+        ValueError on bad parameters'''
+        data_dir = os.path.realpath(data_dir)
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        for name in ("schedule", "travel", "profile"):
+            if name in params:
+                params[name] = _data_path(data_dir, params[name])
+        for quantity in QUANTITIES:
+            spec = params.get(f"{quantity}_dist", "")
+            if spec.startswith("empirical:"):
+                params[f"{quantity}_dist"] = "empirical:" + _data_path(data_dir, spec.partition(":")[2])
+        scenario = cls(arrival_rate=float(params.get("rate", 10)), sim_time=int(params.get("time", 10000)),
+                       seed=int(params["seed"]) if "seed" in params else None,
+                       schedule=params.get("schedule"), travel_times=params.get("travel"),
+                       profile=params.get("profile"),
+                       distributions={quantity: params[f"{quantity}_dist"] for quantity in QUANTITIES
+                                      if f"{quantity}_dist" in params})
+        if (scenario.schedule is None) != (scenario.travel_times is None):
+            raise ValueError("'schedule' and 'travel' must be given together")
+        if scenario.schedule is not None and scenario.profile is not None:
+            raise ValueError("'profile' can't be used with 'schedule'")
+        if scenario.schedule is not None:
+            for quantity in SCHEDULED_QUANTITIES["process"]:
+                if quantity in scenario.distributions:
+                    raise ValueError(f"'{quantity}_dist' can't be used with 'schedule', which gives {quantity} times")
+        if not (math.isfinite(scenario.arrival_rate) and scenario.arrival_rate > 0):
+            raise ValueError("'rate' must be a positive number")
+        if scenario.sim_time <= 0:
+            raise ValueError("'time' must be positive")
+        for spec in scenario.distributions.values():
+            parse_spec(spec)
+        return scenario
+
+    def is_deterministic(self):
+        '''only runs that are guaranteed to repeat exactly may be cached or shared between requests'''
+        if self.seed is not None:
+            return True
+        # a schedule gives everything except replacement crew shifts, which are random unless they're constant
+        shift = self.distributions.get("shift", QUANTITIES["shift"])
+        return self.schedule is not None and shift.startswith("constant:")
+
+    def key(self):
+        '''cache key; file inputs are keyed by their current version rather than just their name'''
+        distributions = tuple(sorted((quantity, _spec_stamp(spec)) for quantity, spec in self.distributions.items()))
+        if self.schedule is not None:
+            return _file_stamp(self.schedule), _file_stamp(self.travel_times), self.seed, distributions
+        if self.profile is not None:
+            return _file_stamp(self.profile), self.sim_time, self.seed, distributions
+        return self.arrival_rate, self.sim_time, self.seed, distributions
+
+    def args(self):
+        return (self.arrival_rate, self.sim_time, self.seed, self.schedule, self.travel_times, self.profile,
+                self.distributions)
+
+
+class SimServer:
+    """Dispatches scenarios to a pool of warm worker processes, sharing in-flight runs and caching results"""
+
+    def __init__(self, workers=None, cache_size=256, data_dir="."):
+        self.data_dir = os.path.realpath(data_dir)  # request file names are relative to this
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # LRU cache of finished results; most recently used at the end
+        self.in_flight = {}  # scenario key -> future of a run that is still going
+        self.hits = 0
+        self.misses = 0
+
+    async def submit(self, scenario):
+        '''returns the output of 'scenario', reusing a cached or already running result when possible'''
+        loop = asyncio.get_running_loop()
+        if not scenario.is_deterministic():
+            self.misses += 1
+            return await loop.run_in_executor(self.pool, run_scenario, *scenario.args())
+
+        key = scenario.key()
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        future = self.in_flight.get(key)
+        if future is None:
+            self.misses += 1
+            future = loop.run_in_executor(self.pool, run_scenario, *scenario.args())
+            self.in_flight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.hits += 1
+        return await asyncio.shield(future)  # a client hanging up must not cancel the run for everyone else
+
+    def _finish(self, key, future):
+        '''moves a finished run from the in-flight table into the cache'''
+        del self.in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.cache[key] = future.result()
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)  # evict least recently used
+
+    async def handle(self, reader, writer):
+        '''serves a single HTTP request'''
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # headers aren't needed
+
+            try:
+                method, target, _ = request_line.decode("latin-1").split()
+            except ValueError:
+                await self._respond(writer, 400, "malformed request\n")
+                return
+            url = urlsplit(target)
+
+            if method != "GET":
+                await self._respond(writer, 405, "only GET is supported\n")
+            elif url.path == "/run":
+                try:
+                    scenario = Scenario.from_query(url.query, self.data_dir)
+                    scenario.key()  # fails early if a schedule file doesn't exist
+                except (ValueError, OSError) as e:
+                    await self._respond(writer, 400, f"{e}\n")
+                    return
+                try:
+                    result = await self.submit(scenario)
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)  # the details stay in the server's log
+                    await self._respond(writer, 500, "simulation failed\n")
+                    return
+                await self._respond(writer, 200, result)
+            elif url.path == "/stats":
+                await self._respond(writer, 200, f"hits: {self.hits}\nmisses: {self.misses}\n"
+                                                 f"cached: {len(self.cache)}\nin flight: {len(self.in_flight)}\n")
+            else:
+                await self._respond(writer, 404, "unknown path\n")
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, body):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   500: "Internal Server Error"}
+        body = body.encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {reasons[status]}\r\n"
+                     f"Content-Type: text/plain; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8080, unix_path=None):
+        '''serves requests until cancelled'''
+        # the pool only starts a worker when a job is waiting for one, so start them all before the first request
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _started) for _ in range(self.workers)))
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve train sim runs over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--cache-size", type=int, default=256, help="number of results kept in the cache")
+    parser.add_argument("--data-dir", default=".",
+                        help="directory that schedule, travel, profile and empirical files are read from (default: .)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(SimServer(args.workers, args.cache_size, args.data_dir).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -1,3 +1,4 @@
+import random
 from random import uniform, seed
 import data_structures as ds
 from math import log
@@ -11,39 +12,56 @@ def expovariate(rate):
     return -log(u)/rate
 
 
-def generate_arrival_events(sim_time, arrival_average):
+def generate_arrival_events(sim_time, arrival_average, profile=None, service=None):
     '''generate every arrival event that will happen throughout the sim; returns priority queue'''
+    '''if given, the RateProfile 'profile' replaces the constant arrival average and the trains draw their random
+    values from the ServiceTimes service'''
     '''MUST NOT BE USED WITH parse_train_arrival_file'''
-    eventQueue = ds.eventQueue()
+    trains = []
     now = 0
     current_train = 0  # for tracking train id
 
-    while now < sim_time:
-        interval = round(expovariate(1/arrival_average), 2)  # the poisson process
-        now += interval
-        if now >= sim_time:
-            break
-        else:
-            eventQueue.push(ds.train(now, current_train))
+    if profile is not None:
+        for arrival in profile.arrival_times(random):  # the time-varying poisson process, on the global random stream
+            now = round(arrival, 2)
+            if now >= sim_time:
+                break
+            trains.append(ds.train(now, current_train, service))
             current_train += 1
 
-    return eventQueue
+    else:
+        while now < sim_time:
+            interval = round(expovariate(1/arrival_average), 2)  # the poisson process
+            now += interval
+            if now >= sim_time:
+                break
+            else:
+                trains.append(ds.train(now, current_train, service))
+                current_train += 1
 
+    return ds.eventQueue(trains, is_sorted=True)  # arrivals are generated in order, so no heap needs to be built
 
-def parse_train_arrival_file(file):
+
+def parse_train_arrival_file(file, service=None):
     '''generates every arrival event based on a provided arrival schedule; returns priority queue'''
     '''MUST NOT BE USED WITH generate_arrival_events'''
-    eventQueue = ds.eventQueue()
+    trains = []
     current_train = 0
+    previous_arrival = float("-inf")
+    is_sorted = True  # recorded schedules are almost always in order of arrival
 
     for line in file:
-        arrival, unload, crew_hours = line.strip().split()
-        train = ds.train(float(arrival), current_train)  # create train object with specified arrival time
+        arrival, unload, crew_hours = line.split()
+        arrival = float(arrival)
+        train = ds.train(arrival, current_train, service)  # create train object with specified arrival time
         train.override_train_values(float(unload), float(crew_hours))  # override the random values for unload and crew
-        eventQueue.push(train)
+        trains.append(train)
+        if arrival < previous_arrival:
+            is_sorted = False
+        previous_arrival = arrival
         current_train += 1
 
-    return eventQueue
+    return ds.eventQueue(trains, is_sorted)  # heapified only if the schedule was out of order
 
 
 def parse_crew_arrival_file(file):
@@ -1,5 +1,8 @@
+import random
 import data_structures as ds
 import sim_setup as ss
+from arrival_profile import read_profile
+from distributions import ServiceTimes
 
 SIMULATION_TIME = 100000
 ARRIVAL_AVERAGE = 10
@@ -24,23 +27,24 @@ def depart(time, train, queue_size):
     print(f"Time {round(time, 2)}: train {train.train_id} departing (Q={queue_size})")
 
 
-if __name__ == "__main__":
-    #args = ss.get_args()
-    #args = ["-s", "schedule.txt", "traveltimes.txt"]
-    args = ["7", "50000"]
-    if args[0] == "-s":
-        arrival_schedule = open(args[1], 'r')
-        events = ss.parse_train_arrival_file(arrival_schedule)
-        arrival_schedule.close()
-
-        new_crew_times = open(args[2], 'r')
-        preloaded_crew_times = ss.parse_crew_arrival_file(new_crew_times)
-        new_crew_times.close()
+def run_simulation(arrival_average=ARRIVAL_AVERAGE, simulation_time=SIMULATION_TIME, seed=None, schedule=None,
+                   travel_times=None, profile=None, distributions=None):
+    '''runs one full simulation and prints its statistics; returns the stat tracker
+    if 'schedule' is given, arrivals are read from that file and 'travel_times' must name the crew travel time file
+    if 'profile' is given, arrivals follow the rate profile in that file instead of the arrival average
+    'distributions' optionally maps quantities (see distributions.QUANTITIES) to distribution spec strings'''
+    random.seed(seed)
+    service = ServiceTimes(distributions, seed)
+    if schedule is not None:
+        with open(schedule, 'r') as arrival_schedule:
+            events = ss.parse_train_arrival_file(arrival_schedule, service)
+
+        with open(travel_times, 'r') as new_crew_times:
+            preloaded_crew_times = ss.parse_crew_arrival_file(new_crew_times)
 
     else:
-        ARRIVAL_AVERAGE = int(args[0])
-        SIMULATION_TIME = int(args[1])
-        events = ss.generate_arrival_events(SIMULATION_TIME, ARRIVAL_AVERAGE)
+        rate_profile = read_profile(profile) if profile is not None else None
+        events = ss.generate_arrival_events(simulation_time, arrival_average, rate_profile, service)
         preloaded_crew_times = None
 
     train_queue = ds.trainQueue()
@@ -48,14 +52,14 @@ if __name__ == "__main__":
     now = 0
     loading = None
 
-    while now < SIMULATION_TIME or not events.is_empty() or not train_queue.is_empty() or loading is not None:
+    while now < simulation_time or not events.is_empty() or not train_queue.is_empty() or loading is not None:
         stats.pass_time(now, train_queue.size())
         stats.max_queue(train_queue.size())
         first_train = train_queue.peak_top()
         next_event = events.peak_top()
 
         if next_event is None:
-            next_event = ds.train(SIMULATION_TIME*2, -1)  # creates a "ghost train" that doesn't really exist.
+            next_event = ds.train(simulation_time*2, -1, service)  # creates a "ghost train" that doesn't really exist.
             # the point of this is to prevent conditions that use "next_event" from throwing an error,
             # but it doesn't change the outcome of the sim since time 2*SIM_TIME will never occur
 
@@ -177,4 +181,10 @@ if __name__ == "__main__":
     print(f"Time {now:.2f}: simulation ended")
     print()
     stats.report_stats()
+    return stats
 
+
+if __name__ == "__main__":
+    import sys
+    import sim
+    sim.main(sys.argv[1:], engine="event")
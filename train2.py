@@ -1,8 +1,9 @@
-import simpy as sp
-from random import Random, seed
+from random import Random
 from math import log
-import process_classes as pc
-import sys
+from arrival_profile import read_profile
+from distributions import ServiceTimes
+# simpy (through process_classes) is imported inside the functions that need it, which keeps startup cheap for
+# callers that never run the sim, e.g. printing usage
 
 
 SIM_TIME = 10000
@@ -16,60 +17,85 @@ def expovariate(rate, stream):
     return -log(u)/rate
 
 
-def arrivals(env, dock, tracker):
-    """event generator for train arrivals"""
-    # generate separate random streams
-    arrival_stream = Random()
-    unload_stream = Random()
-    crew_time_stream = Random()
-    crew_arrival_stream = Random()
-
-    latest_train = None  # used only at the end to wait on the final train departure
-    while env.now <= SIM_TIME:
-        yield env.timeout(expovariate(1/ARRIVAL_RATE, arrival_stream))  # wait amount of time according to exponential dist
-        latest_train = pc.Train(env, unload_time=unload_stream.uniform(3.5, 4.5), dock=dock,
-                                crew_time=crew_time_stream.uniform(6, 11), rand_stream=crew_arrival_stream, stats=tracker)
-
-    yield latest_train.departed  # wait for final train departure (and end simulation when it departs)
+def arrivals(env, dock, tracker, arrival_rate=ARRIVAL_RATE, sim_time=SIM_TIME, seed=SEED, profile=None,
+             distributions=None):
+    """event generator for train arrivals; 'profile' is an optional RateProfile that replaces the constant rate
+    and 'distributions' optionally maps quantities (see distributions.QUANTITIES) to distribution specs"""
+    import process_classes as pc
+    # generate separate random streams; seeding the parent stream makes the whole run reproducible
+    parent_stream = Random(seed)
+    arrival_stream = Random(parent_stream.getrandbits(64))
+    unload_stream = Random(parent_stream.getrandbits(64))
+    crew_time_stream = Random(parent_stream.getrandbits(64))
+    crew_arrival_stream = Random(parent_stream.getrandbits(64))
+    service = ServiceTimes(distributions, parent_stream.getrandbits(64),
+                           {"unload": unload_stream, "crew": crew_time_stream, "travel": crew_arrival_stream})
+    crews = pc.CrewScheduler(env)
 
+    arrival_times = profile.arrival_times(arrival_stream) if profile is not None else None
 
-def scheduled_arrivals(env, dock, tracker, schedule, travel_times):
+    latest_train = None  # used only at the end to wait on the final train departure
+    while env.now <= sim_time:
+        if arrival_times is None:
+            yield env.timeout(expovariate(1/arrival_rate, arrival_stream))  # wait amount of time according to exponential dist
+        else:
+            arrival = next(arrival_times, None)  # next arrival of the time-varying poisson process
+            if arrival is None:
+                break  # the profile's rate dropped to 0 for good
+            yield env.timeout(arrival - env.now)
+        latest_train = pc.Train(env, unload_time=service.unload(), dock=dock, crew_time=service.crew(),
+                                service=service, crews=crews, stats=tracker)
+
+    if latest_train is not None:
+        yield latest_train.departed  # wait for final train departure (and end simulation when it departs)
+
+
+def scheduled_arrivals(env, dock, tracker, schedule, travel_times, distributions=None, seed=SEED):
     """event generator for pre-generated, scheduled arrivals"""
+    import process_classes as pc
+    service = ServiceTimes(distributions, seed)  # only replacement crew shifts are drawn; the files give everything else
+    crews = pc.CrewScheduler(env)
     latest_train = None  # used only at the end to wait on the final train departure
     for line in schedule:
         arrival, unload, crew_hours = line.strip().split()  # fetch pre-generated floats from file
         yield env.timeout(float(arrival) - env.now)  # wait until the next train arrival
         latest_train = pc.Train(env, unload_time=float(unload), dock=dock, crew_time=float(crew_hours),
-                                stats=tracker, rand_stream=None, trav_times=travel_times)
+                                stats=tracker, service=service, crews=crews, trav_times=travel_times)
 
     yield latest_train.departed  # wait for final train departure (and end simulation when it departs)
 
 
-if __name__ == "__main__":
+def run_simulation(arrival_rate=ARRIVAL_RATE, sim_time=SIM_TIME, seed=SEED, schedule=None, travel_times=None,
+                   profile=None, distributions=None):
+    """runs one full simulation and prints its event log and statistics; returns the stat tracker
+    if 'schedule' is given, arrivals are read from that file and 'travel_times' must name the crew travel time file
+    if 'profile' is given, arrivals follow the rate profile in that file instead of 'arrival_rate'
+    'distributions' optionally maps quantities (see distributions.QUANTITIES) to distribution spec strings"""
+    import simpy as sp
+    import process_classes as pc
+    pc.reset_counters()  # ids start from 0 even when several sims run in the same process
     env = sp.Environment()
     stats = pc.StatTracker(env)
     dock = sp.Resource(env, capacity=1)  # loading dock is a shared resource that creates an implied train queue
 
-    args = sys.argv[1:]
-    #args = ["-s", "schedule.txt", "traveltimes.txt"]  # used for testing/debugging
-    #args = [ARRIVAL_RATE, SIM_TIME]  # used for testing/debugging
-    if args[0] == "-s":
-        arrival_schedule = open(args[1], 'r')
-        new_crew_times = open(args[2], 'r')
-        arrival_process = env.process(scheduled_arrivals(env, dock, stats, arrival_schedule, new_crew_times))
-
-        env.run(arrival_process)  # ends sim when arrival_process ends (which is when the final train departs)
-
-        arrival_schedule.close()
-        new_crew_times.close()
+    if schedule is not None:
+        with open(schedule, 'r') as arrival_schedule, open(travel_times, 'r') as new_crew_times:
+            arrival_process = env.process(scheduled_arrivals(env, dock, stats, arrival_schedule, new_crew_times,
+                                                             distributions, seed))
+            env.run(arrival_process)  # ends sim when arrival_process ends (which is when the final train departs)
 
     else:
-        seed(SEED)  # used for debugging
-        ARRIVAL_RATE = float(args[0])
-        SIM_TIME = int(args[1])
-        arrival_process = env.process(arrivals(env, dock, stats))  # creates arrival process/generator
-
+        rate_profile = read_profile(profile) if profile is not None else None
+        arrival_process = env.process(arrivals(env, dock, stats, arrival_rate, sim_time, seed, rate_profile,
+                                               distributions))
         env.run(arrival_process)  # ends sim when arrival_process ends (which is when the final train departs)
 
     print(f"Time {env.now:.2f}: Simulation ended")
     stats.printout()  # print stats
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    import sim
+    sim.main(sys.argv[1:], engine="process")